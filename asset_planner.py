@@ -1,38 +1,3 @@
-import os
-import json
-import sys
-import importlib
-
-# パッケージのインポートを試みる、ローカル実行時のみ必要に応じてインストール
-required_packages = [
-    "streamlit",
-    "pandas",
-    "numpy",
-    "matplotlib",
-    "japanize_matplotlib",
-    "plotly"
-]
-
-def install_missing_packages():
-    """ローカル環境でのみ実行され、不足パッケージをインストールする"""
-    # Streamlit Cloud環境ではスキップ
-    if os.environ.get('STREAMLIT_SHARING') or os.environ.get('IS_STREAMLIT_CLOUD'):
-        return
-    
-    import subprocess
-    for package in required_packages:
-        try:
-            importlib.import_module(package)
-        except ImportError:
-            print(f"{package} がインストールされていません。インストールします...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", package])
-            print(f"{package} のインストールが完了しました。")
-
-# パッケージのインストールを確認
-install_missing_packages()
-
-# 以下、通常のインポート...
-
 # パッケージのインポート部分
 try:
     import streamlit as st
@@ -43,7 +8,7 @@ try:
     import plotly.graph_objects as go
     from plotly.subplots import make_subplots
     import datetime
-    import calendar
+    from dataclasses import fields
 except ImportError as e:
     import streamlit as st
     st.error(f"""
@@ -58,14 +23,14 @@ except ImportError as e:
     - japanize_matplotlib
     - plotly
     
-    ローカルで実行する場合は、`pip install <パッケージ名>` でインストールしてください。
+    ローカルで実行する場合は、`pip install -r requirements.txt` でインストールしてください。
     """)
     st.stop()
     
 # 自作モジュールのインポート
 from utils import (
-    convert_to_yen, format_japanese_yen, 
-    save_config, load_config
+    convert_to_yen, format_japanese_yen,
+    save_config, load_config, SimInputs
 )
 from visualizations import (
     create_asset_growth_chart, create_contribution_pie_chart,
@@ -92,13 +57,27 @@ def main():
     transformed_data = transform_input_data(input_values)
     
     # シミュレーション計算
-    df = run_simulation(transformed_data)
+    df = run_simulation(
+        transformed_data.years,
+        transformed_data.stock_return,
+        transformed_data.bond_return,
+        transformed_data.savings_return,
+        transformed_data.monthly_stock,
+        transformed_data.monthly_bond,
+        transformed_data.monthly_savings,
+        transformed_data.initial_stock,
+        transformed_data.initial_bond,
+        transformed_data.initial_savings
+    )
+    
+    # 日付の追加（実行日に依存するためキャッシュの外で行う）
+    add_date_columns(df, transformed_data.years * 12)
     
     # 可視化
     visualize_data(df, transformed_data, input_values)
     
     # データダウンロード機能
-    provide_data_download(df)
+    provide_data_download(df, transformed_data.initial_total)
 
 def get_user_inputs(saved_config):
     """サイドバーから入力値を取得する"""
@@ -232,142 +211,162 @@ def get_user_inputs(saved_config):
 
 def transform_input_data(inputs):
     """入力値を変換して計算用データを作成する"""
-    data = {}
-    
     # 万円を円に変換
-    data['monthly_stock'] = convert_to_yen(inputs['monthly_stock_man'])
-    data['monthly_bond'] = convert_to_yen(inputs['monthly_bond_man'])
-    data['monthly_savings'] = convert_to_yen(inputs['monthly_savings_man'])
-    
-    data['initial_stock'] = convert_to_yen(inputs['initial_stock_man'])
-    data['initial_bond'] = convert_to_yen(inputs['initial_bond_man'])
-    data['initial_savings'] = convert_to_yen(inputs['initial_savings_man'])
-    
-    data['current_stock'] = convert_to_yen(inputs['current_stock_man'])
-    data['current_bond'] = convert_to_yen(inputs['current_bond_man'])
-    data['current_savings'] = convert_to_yen(inputs['current_savings_man'])
-    
-    # その他のデータをそのままコピー
-    data['years'] = inputs['years']
-    data['stock_return'] = inputs['stock_return']
-    data['bond_return'] = inputs['bond_return']
-    data['savings_return'] = inputs['savings_return']
-    
-    # 現在の総資産額を計算
-    data['current_total_assets'] = data['current_stock'] + data['current_bond'] + data['current_savings']
-    data['initial_total'] = data['initial_stock'] + data['initial_bond'] + data['initial_savings']
-    
-    return data
+    monthly_stock = convert_to_yen(inputs['monthly_stock_man'])
+    monthly_bond = convert_to_yen(inputs['monthly_bond_man'])
+    monthly_savings = convert_to_yen(inputs['monthly_savings_man'])
+    
+    initial_stock = convert_to_yen(inputs['initial_stock_man'])
+    initial_bond = convert_to_yen(inputs['initial_bond_man'])
+    initial_savings = convert_to_yen(inputs['initial_savings_man'])
+    
+    current_stock = convert_to_yen(inputs['current_stock_man'])
+    current_bond = convert_to_yen(inputs['current_bond_man'])
+    current_savings = convert_to_yen(inputs['current_savings_man'])
+    
+    return SimInputs(
+        years=inputs['years'],
+        stock_return=inputs['stock_return'],
+        bond_return=inputs['bond_return'],
+        savings_return=inputs['savings_return'],
+        monthly_stock=monthly_stock,
+        monthly_bond=monthly_bond,
+        monthly_savings=monthly_savings,
+        initial_stock=initial_stock,
+        initial_bond=initial_bond,
+        initial_savings=initial_savings,
+        current_stock=current_stock,
+        current_bond=current_bond,
+        current_savings=current_savings,
+        # 現在の総資産額を計算
+        current_total_assets=current_stock + current_bond + current_savings,
+        initial_total=initial_stock + initial_bond + initial_savings
+    )
 
-def run_simulation(data):
+def _grow_monthly(initial, monthly, annual_return, steps):
+    """月次複利で積み立てた場合の各月末残高を一括で計算する"""
+    g = 1 + annual_return / 12
+    growth = g ** steps
+    if g == 1:
+        # 利回り0%の場合は単純な積み上げ
+        return initial + monthly * steps
+    return initial * growth + monthly * (growth - 1) / (g - 1)
+
+@st.cache_data(max_entries=32)
+def run_simulation(years, stock_return, bond_return, savings_return,
+                   monthly_stock, monthly_bond, monthly_savings,
+                   initial_stock, initial_bond, initial_savings):
     """資産形成のシミュレーションを実行する"""
-    months = data['years'] * 12
-    df = pd.DataFrame(index=range(months + 1))
-    
-    # 初期値の設定
-    df.loc[0, '株式'] = data['initial_stock']
-    df.loc[0, '債券'] = data['initial_bond']
-    df.loc[0, '預金'] = data['initial_savings']
-    df.loc[0, '総資産'] = data['initial_stock'] + data['initial_bond'] + data['initial_savings']
-    df.loc[0, '積立合計'] = 0
-    
-    # 運用シミュレーション
-    for i in range(1, months + 1):
-        # 前月の資産に利回りを適用（月次）
-        df.loc[i, '株式'] = df.loc[i-1, '株式'] * (1 + data['stock_return']/12) + data['monthly_stock']
-        df.loc[i, '債券'] = df.loc[i-1, '債券'] * (1 + data['bond_return']/12) + data['monthly_bond']
-        df.loc[i, '預金'] = df.loc[i-1, '預金'] * (1 + data['savings_return']/12) + data['monthly_savings']
-        df.loc[i, '総資産'] = df.loc[i, '株式'] + df.loc[i, '債券'] + df.loc[i, '預金']
-        
-        # 積立合計額の累計
-        df.loc[i, '積立合計'] = df.loc[i-1, '積立合計'] + data['monthly_stock'] + data['monthly_bond'] + data['monthly_savings']
-    
-    # 列を追加：運用益（総資産 - 積立合計 - 初期資産）
-    df['運用益'] = df['総資産'] - df['積立合計'] - data['initial_total']
-    
-    # 日付の追加
-    add_date_columns(df, months)
+    months = years * 12
+    steps = np.arange(months + 1, dtype=np.float64)
+    
+    # 漸化式 v_i = v_{i-1} * (1 + r/12) + c の閉形式で各資産を計算
+    stock = _grow_monthly(initial_stock, monthly_stock, stock_return, steps)
+    bond = _grow_monthly(initial_bond, monthly_bond, bond_return, steps)
+    savings = _grow_monthly(initial_savings, monthly_savings, savings_return, steps)
+    total = stock + bond + savings
+    
+    # 積立合計額の累計
+    contribution = steps * (monthly_stock + monthly_bond + monthly_savings)
+    
+    df = pd.DataFrame({
+        '株式': stock,
+        '債券': bond,
+        '預金': savings,
+        '総資産': total,
+        '積立合計': contribution,
+    })
     
     return df
 
 def add_date_columns(df, months):
     """日付関連の列を追加する"""
-    # 月末ベースで日付のインデックスを作成
-    start_date = datetime.datetime.now()
-    date_index = []
-    current_date = start_date
-    
-    for i in range(months + 1):
-        date_index.append(current_date)
-        # 次の月を正確に計算（月末の日付を計算）
-        if i < months:
-            # 現在の月に1を加え、日付は月末に設定
-            next_month = current_date.month + 1
-            next_year = current_date.year
-            if next_month > 12:
-                next_month = 1
-                next_year += 1
-            # その月の最終日を取得
-            last_day = calendar.monthrange(next_year, next_month)[1]
-            current_date = datetime.datetime(next_year, next_month, last_day)
+    # 初月は本日、以降は各月の月末日で日付のインデックスを作成
+    start_date = pd.Timestamp.now().normalize()
+    month_ends = pd.date_range(
+        start=start_date + pd.offsets.MonthBegin(1),
+        periods=months,
+        freq='ME'
+    )
+    date_index = month_ends.insert(0, start_date)
     
     df['日付'] = date_index
-    df['年月'] = [d.strftime('%Y年%m月') for d in date_index]
+    df['年月'] = date_index.strftime('%Y年%m月')
+
+def get_input_keys(data, start_date):
+    """シミュレーション条件と現在の資産額それぞれのキーを作成する"""
+    # 日付列は実行日に依存するため、開始日もシミュレーション側のキーに含める
+    sim_key = tuple(getattr(data, f.name) for f in fields(data) if not f.name.startswith('current_')) + (start_date,)
+    prog_key = tuple(getattr(data, f.name) for f in fields(data) if f.name.startswith('current_'))
+    return sim_key, prog_key
+
+def get_figure(name, key, build):
+    """入力のキーが変わった場合のみグラフを作り直す"""
+    if st.session_state.get(f'{name}_key') != key:
+        st.session_state[f'{name}_fig'] = build()
+        st.session_state[f'{name}_key'] = key
+    return st.session_state[f'{name}_fig']
 
 def visualize_data(df, data, inputs):
     """データの可視化を行う"""
+    sim_key, prog_key = get_input_keys(data, df['日付'].iloc[0])
+    
     # 資産推移と積立額・運用益のグラフを表示
     cols1, cols2 = st.columns(2)
     
     with cols1:
         st.subheader("資産推移")
         
-        fig = create_asset_growth_chart(
+        fig = get_figure('growth', (sim_key, prog_key), lambda: create_asset_growth_chart(
             df, 
-            data['current_total_assets'], 
-            data['current_stock'], 
-            data['current_bond'], 
-            data['current_savings']
-        )
+            data.current_total_assets, 
+            data.current_stock, 
+            data.current_bond, 
+            data.current_savings
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     with cols2:
         st.subheader("積立額と運用益")
         
-        months = data['years'] * 12
-        final_investment = df.loc[months, '積立合計']
-        final_return = df.loc[months, '運用益']
-        final_initial = data['initial_total']
+        months = data.years * 12
+        final_investment = float(df.loc[months, '積立合計'])
+        final_initial = data.initial_total
+        # 運用益（総資産 - 積立合計 - 初期資産）
+        final_return = float(df.loc[months, '総資産']) - final_investment - final_initial
         
         if final_investment + final_return + final_initial > 0:
-            fig = create_contribution_pie_chart(
+            fig = get_figure('contribution', sim_key, lambda: create_contribution_pie_chart(
                 final_investment, 
                 final_return, 
                 final_initial, 
                 inputs['years']
-            )
+            ))
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.write("表示するデータがありません")
     
+    # 1年ごとのデータを抽出（サマリーテーブルと棒グラフで共有）
+    yearly = df.iloc[::12].copy()
+    yearly['経過年数'] = yearly.index // 12
+    
     # 年別サマリーテーブル
-    display_yearly_summary(df)
+    display_yearly_summary(yearly, data.initial_total)
     
     # 年別積み上げ棒グラフ
-    display_yearly_bar_chart(df)
+    display_yearly_bar_chart(yearly, sim_key)
     
     # 進捗状況とアセット配分比較を表示
-    if data['current_total_assets'] > 0:
-        display_progress(df, data)
+    if data.current_total_assets > 0:
+        display_progress(df, data, sim_key, prog_key)
 
-def display_yearly_summary(df):
+def display_yearly_summary(yearly, initial_total):
     """年別サマリーテーブルを表示する"""
     st.subheader("年別サマリー")
     
-    # 1年ごとのデータを抽出
-    yearly_data = df.iloc[::12].copy()
-    yearly_data['経過年数'] = yearly_data.index // 12
-    yearly_data = yearly_data.set_index('経過年数')
+    yearly_data = yearly.set_index('経過年数')
+    # 運用益（総資産 - 積立合計 - 初期資産）は年次データでのみ計算
+    yearly_data['運用益'] = yearly_data['総資産'] - yearly_data['積立合計'] - initial_total
     
     # 表示するデータを選択
     display_data = yearly_data[['日付', '株式', '債券', '預金', '総資産', '積立合計', '運用益']].copy()
@@ -379,28 +378,27 @@ def display_yearly_summary(df):
     
     st.dataframe(display_data, use_container_width=True)
 
-def display_yearly_bar_chart(df):
+def display_yearly_bar_chart(yearly, sim_key):
     """年別積み上げ棒グラフを表示する"""
     st.subheader("年別資産構成の推移")
     
-    # 棒グラフ用のデータ準備
-    bar_data = df.iloc[::12].copy()  # 1年毎のデータ
-    bar_data['経過年数'] = bar_data.index // 12
-    
-    fig = create_yearly_bar_chart(bar_data)
+    fig = get_figure('yearly_bar', sim_key, lambda: create_yearly_bar_chart(yearly))
     st.plotly_chart(fig, use_container_width=True)
 
-def display_progress(df, data):
+def display_progress(df, data, sim_key, prog_key):
     """進捗状況と資産構成比較を表示する"""
     st.subheader("資産形成の進捗状況")
     
-    months = data['years'] * 12
+    months = data.years * 12
     # 現在の総資産がシミュレーション上でどの時点に相当するかを計算
-    progress_point = df[df['総資産'] >= data['current_total_assets']].index[0] if any(df['総資産'] >= data['current_total_assets']) else months
+    # （マイナス利回りでは総資産が減少しうるため、最初に到達する時点を探す）
+    hit = df['総資産'].to_numpy() >= data.current_total_assets
+    progress_point = int(hit.argmax()) if hit.any() else months
     progress_years = progress_point / 12
+    final_total = float(df.loc[months, '総資産'])
     
     # 進捗率の計算（最終予測額に対する割合）
-    progress_percentage = (data['current_total_assets'] / df.loc[months, '総資産']) * 100
+    progress_percentage = (data.current_total_assets / final_total) * 100
     
     cols3, cols4 = st.columns(2)
     
@@ -408,23 +406,23 @@ def display_progress(df, data):
         st.metric(
             "シミュレーション上の進捗点", 
             f"{progress_years:.1f}年目", 
-            f"全体の{progress_years/data['years']*100:.1f}%"
+            f"全体の{progress_years/data.years*100:.1f}%"
         )
     
     with cols4:
         st.metric(
             "最終予測額に対する現在の割合", 
             f"{progress_percentage:.1f}%", 
-            f"目標額 {format_japanese_yen(df.loc[months, '総資産'])}"
+            f"目標額 {format_japanese_yen(final_total)}"
         )
     
     # 進捗バーの表示
     st.progress(min(progress_percentage / 100, 1.0))
     
     # 資産構成比較
-    display_asset_distribution_comparison(df, data, months)
+    display_asset_distribution_comparison(df, data, months, sim_key, prog_key)
 
-def display_asset_distribution_comparison(df, data, months):
+def display_asset_distribution_comparison(df, data, months, sim_key, prog_key):
     """資産構成の比較を表示する"""
     st.subheader("現在の資産構成と目標構成の比較")
     
@@ -432,20 +430,32 @@ def display_asset_distribution_comparison(df, data, months):
     
     with cols5:
         # 現在の資産構成
-        current_values = [data['current_stock'], data['current_bond'], data['current_savings']]
-        fig = create_asset_distribution_chart(current_values, "現在の資産構成")
+        current_values = [data.current_stock, data.current_bond, data.current_savings]
+        fig = get_figure('current_distribution', prog_key, lambda: create_asset_distribution_chart(current_values, "現在の資産構成"))
         st.plotly_chart(fig, use_container_width=True)
     
     with cols6:
         # 最終目標の資産構成
-        final_values = [df.loc[months, '株式'], df.loc[months, '債券'], df.loc[months, '預金']]
-        fig = create_asset_distribution_chart(final_values, f"{data['years']}年後の目標資産構成")
+        final_values = [float(df.loc[months, col]) for col in ['株式', '債券', '預金']]
+        fig = get_figure('final_distribution', sim_key, lambda: create_asset_distribution_chart(final_values, f"{data.years}年後の目標資産構成"))
         st.plotly_chart(fig, use_container_width=True)
 
-def provide_data_download(df):
+@st.cache_data(max_entries=32)
+def _to_csv_bytes(df, initial_total):
+    """DataFrameをExcelで開けるCSVのバイト列に変換する"""
+    # 運用益（総資産 - 積立合計 - 初期資産）を出力時に積立合計の次の列へ追加
+    export = df.copy()
+    export.insert(
+        export.columns.get_loc('積立合計') + 1,
+        '運用益',
+        export['総資産'] - export['積立合計'] - initial_total
+    )
+    return export.to_csv(index=False).encode('utf-8-sig')
+
+def provide_data_download(df, initial_total):
     """シミュレーション結果のダウンロード機能"""
     st.subheader("データダウンロード")
-    csv = df.to_csv(index=False).encode('utf-8-sig')
+    csv = _to_csv_bytes(df, initial_total)
     st.download_button(
         label="シミュレーション結果をCSVでダウンロード",
         data=csv,
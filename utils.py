@@ -1,5 +1,7 @@
 import os
 import json
+from dataclasses import dataclass
+from functools import lru_cache
 import streamlit as st
 
 # 万円単位で入力して円に変換する関数
@@ -7,6 +9,26 @@ def convert_to_yen(value):
     """万円を円に変換する"""
     return int(value * 10000)
 
+# シミュレーションの入力値（円単位に変換済み）
+@dataclass(slots=True, frozen=True)
+class SimInputs:
+    """計算用に変換した入力値"""
+    years: int
+    stock_return: float
+    bond_return: float
+    savings_return: float
+    monthly_stock: int
+    monthly_bond: int
+    monthly_savings: int
+    initial_stock: int
+    initial_bond: int
+    initial_savings: int
+    current_stock: int
+    current_bond: int
+    current_savings: int
+    current_total_assets: int
+    initial_total: int
+
 # 数値を日本語の単位（万、億）で表示する関数
 def format_japanese_yen(value):
     """金額を日本語の単位（万円、億円）で表示する"""
@@ -22,8 +44,11 @@ def save_config(config_path, config):
     """設定をJSONファイルに保存する"""
     with open(config_path, 'w', encoding='utf-8') as f:
         json.dump(config, f, ensure_ascii=False, indent=4)
+    # 保存後は読み込みキャッシュを破棄する
+    load_config.clear()
 
 # 設定を読み込む関数
+@st.cache_data
 def load_config(config_path):
     """設定をJSONファイルから読み込む"""
     if os.path.exists(config_path):
@@ -34,13 +59,30 @@ def load_config(config_path):
             st.warning(f"設定ファイルの読み込みに失敗しました: {e}")
     return {}
 
+# Y軸の目盛りの区分（下限値, 目盛り間隔）
+_Y_AXIS_BUCKETS = (
+    (100000000, 50000000),  # 1億円以上の場合は5000万円ごと
+    (10000000, 5000000),    # 1000万円以上の場合は500万円ごと
+    (1000000, 1000000),     # 100万円以上の場合は100万円ごと
+    (0, 100000),            # 100万円未満の場合は10万円ごと
+)
+
 # Y軸の目盛り値とテキストを作成する関数
 def create_y_axis_ticks(max_value):
     """Y軸の目盛りを作成する"""
-    if max_value >= 100000000:  # 1億円以上の場合
-        tick_step = 50000000  # 5000万円ごと
-        max_tick = (max_value // tick_step + 1) * tick_step
-        tickvals = list(range(0, int(max_tick) + tick_step, tick_step))
+    for bucket_index, (lower, tick_step) in enumerate(_Y_AXIS_BUCKETS):
+        if max_value >= lower:
+            break
+    # 目盛り間隔単位に丸めて、近い値が同じキャッシュを使うようにする
+    max_tick_units = int(max_value // tick_step + 1)
+    tickvals, ticktext = _ticks_for(bucket_index, tick_step, max_tick_units)
+    return list(tickvals), list(ticktext)
+
+@lru_cache(maxsize=256)
+def _ticks_for(bucket_index, tick_step, max_tick_units):
+    """目盛り値とテキストを作成する（区分と目盛り数ごとにキャッシュ）"""
+    tickvals = tuple(range(0, (max_tick_units + 1) * tick_step, tick_step))
+    if bucket_index == 0:  # 1億円以上の場合
         ticktext = []
         for x in tickvals:
             if x == 0:
@@ -52,20 +94,7 @@ def create_y_axis_ticks(max_value):
                     ticktext.append(f"{x/100000000:.1f}億円")
             else:
                 ticktext.append(f"{int(x/10000)}万円")
-    elif max_value >= 10000000:  # 1000万円以上の場合
-        tick_step = 5000000  # 500万円ごと
-        max_tick = (max_value // tick_step + 1) * tick_step
-        tickvals = list(range(0, int(max_tick) + tick_step, tick_step))
-        ticktext = ["0" if x == 0 else f"{int(x/10000)}万円" for x in tickvals]
-    elif max_value >= 1000000:  # 100万円以上の場合
-        tick_step = 1000000  # 100万円ごと
-        max_tick = (max_value // tick_step + 1) * tick_step
-        tickvals = list(range(0, int(max_tick) + tick_step, tick_step))
-        ticktext = ["0" if x == 0 else f"{int(x/10000)}万円" for x in tickvals]
-    else:  # 100万円未満の場合
-        tick_step = 100000  # 10万円ごと
-        max_tick = (max_value // tick_step + 1) * tick_step
-        tickvals = list(range(0, int(max_tick) + tick_step, tick_step))
+    else:
         ticktext = ["0" if x == 0 else f"{int(x/10000)}万円" for x in tickvals]
     
-    return tickvals, ticktext
\ No newline at end of file
+    return tickvals, tuple(ticktext)